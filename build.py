@@ -14,20 +14,94 @@ Related repositories:
 """
 
 import argparse
+import hashlib
+import itertools
+import json
 import logging
 import os
 import shutil
 import subprocess
 import sys
+import tarfile
+import tempfile
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import zstandard
+except ImportError:  # optional: only used for --archive-format zstd
+    zstandard = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Parallel download tuning: number of concurrent range requests, and the
+# smallest installer worth splitting across connections.
+DOWNLOAD_CONNECTIONS = 6
+RANGED_DOWNLOAD_MIN_SIZE = 8 * 1024 * 1024
+
+# Reading response.raw directly surfaces urllib3 errors (e.g. a connection
+# dropped mid-body) that iter_content would have wrapped in RequestException.
+DOWNLOAD_ERRORS = (requests.RequestException, urllib3.exceptions.HTTPError)
+
+# A range whose connection drops mid-body is re-requested from where it
+# stopped, up to this many times, with exponential backoff capped at 10 s.
+RANGE_RETRIES = 4
+
+# Only dropped or timed-out connections are retried. HTTP errors such as a
+# 4xx are permanent, so they fail the download at once.
+RANGE_RETRY_ERRORS = (requests.ConnectionError, requests.Timeout,
+                      requests.exceptions.ChunkedEncodingError, urllib3.exceptions.HTTPError)
+
+# (connect, read) timeouts in seconds for installer body requests. The read
+# timeout bounds each socket read, so a stalled transfer fails instead of
+# hanging the build.
+DOWNLOAD_TIMEOUT = (30, 60)
+
+# Buffer size for every copy of installer bytes (network -> disk,
+# disk -> hash): large enough to keep per-call overhead negligible.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Result of the installer HEAD probe: (size, accepts byte ranges, ETag, URL
+# after redirects).
+InstallerProbe = Tuple[int, bool, Optional[str], str]
+
+# 7-Zip worker threads; capped so large CI runners don't spawn one per core.
+SEVEN_Z_THREADS = min(os.cpu_count() or 1, 8)
+
+# Threads used to copy the libportable files into the browser directory.
+COPY_WORKERS = min(os.cpu_count() or 4, 8)
+
+# Release archive formats: file suffix, and for tarballs the multithreaded
+# compressor tar pipes through.
+ARCHIVE_SUFFIXES = {"7z": ".7z", "zstd": ".tar.zst", "xz": ".tar.xz"}
+TAR_COMPRESSORS = {"zstd": "zstd -T0 -19", "xz": "xz -T0 -9"}
+
+class RangeNotSupportedError(requests.RequestException):
+    """The server answered a range request with something other than that range."""
+
+class _HashingWriter:
+    """File wrapper that feeds every written block into a hash object."""
+
+    def __init__(self, f, digest):
+        self.f = f
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.f.write(data)
+
 class BrowserBuilder:
     def __init__(self, args: argparse.Namespace):
         self.browser_name: str = args.browser.lower()
@@ -36,12 +110,32 @@ class BrowserBuilder:
         self.libportable_path: Path = Path(args.libportable).resolve()
         self.seven_z_path_arg: Optional[str] = args.seven_z_path
         self.launcher_arg: Optional[str] = args.launcher
+        self.release_repo: Optional[str] = args.release_repo
+        self.expected_sha256: Optional[str] = args.sha256.lower() if args.sha256 else None
+        self.archive_format: str = args.archive_format
         
+        # One session for every request so TLS connections to the CDN and
+        # api.github.com are reused, including across parallel range workers.
+        self.session = requests.Session()
+        # Installer bodies are copied from response.raw undecoded: they are
+        # already compressed, and the bytes on disk must match Content-Length,
+        # range offsets and published checksums. Ask servers not to re-encode.
+        self.session.headers.update({"User-Agent": "browser-builder", "Accept-Encoding": "identity"})
+        adapter = HTTPAdapter(
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
         if not self.libportable_path.exists():
             raise FileNotFoundError(f"Libportable path not found: {self.libportable_path}")
 
         self.workspace: Path = Path(args.workspace).resolve() if args.workspace else Path(os.getcwd())
         self.temp_dir: Path = self.workspace / "temp_build"
+        self.extract_dir: Path = self.temp_dir / "extracted"
+        # Deletes stale trees off the critical path; see _discard_tree().
+        self._gc = ThreadPoolExecutor(max_workers=1)
         self.output_dir: Path = self.workspace / "output"
         self.installer_name: str = f"{self.browser_name}_installer.exe"
         
@@ -57,8 +151,9 @@ class BrowserBuilder:
             
         self.config = self.browser_configs[self.browser_name]
 
-    def _get_seven_z(self) -> str:
-        """Resolve 7z executable path."""
+    @cached_property
+    def seven_z(self) -> str:
+        """7z executable path, resolved on first use and reused afterwards."""
         if self.seven_z_path_arg and os.path.exists(self.seven_z_path_arg):
             return self.seven_z_path_arg
             
@@ -76,116 +171,441 @@ class BrowserBuilder:
         """Validate version and URL."""
         if not self.version or not self.url:
             raise ValueError("Version and URL must be provided via arguments.")
-        logger.info(f"Resolved version: {self.version}")
-        logger.info(f"Resolved URL: {self.url}")
+        logger.info("Resolved version: %s", self.version)
+        logger.info("Resolved URL: %s", self.url)
+
+    def check_remote_release(self) -> bool:
+        """Return True if ``--release-repo`` already has a release for this version.
+
+        Published releases are remembered in ``<workspace>/.cache/releases.json``
+        so retried jobs skip the GitHub API round-trip.
+        """
+        if not self.release_repo:
+            return False
 
-    def download(self) -> Path:
+        cache_path = self.workspace / ".cache" / "releases.json"
+        key = f"{self.release_repo}@{self.version}"
+        try:
+            cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cache = {}
+        if cache.get(key):
+            logger.info("Release %s found in cache.", key)
+            return True
+
+        url = f"https://api.github.com/repos/{self.release_repo}/releases/tags/{self.version}"
+        headers = {"Accept": "application/vnd.github+json"}
+        if "GITHUB_TOKEN" in os.environ:
+            headers["Authorization"] = f"Bearer {os.environ['GITHUB_TOKEN']}"
+        try:
+            # HEAD is enough to learn whether the tag exists; skip the JSON body.
+            r = self.session.head(url, headers=headers, timeout=30)
+            if r.status_code == 404:
+                return False
+            r.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning("Release check failed, building anyway: %s", e)
+            return False
+
+        cache[key] = True
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+        except OSError as e:
+            logger.warning("Failed to write release cache: %s", e)
+        return True
+
+    def download(self, probe: Optional[InstallerProbe] = None) -> Path:
+        """Download the installer; ``probe`` is a prefetched _probe_installer() result.
+
+        A previous download is reused when its ``.meta.json`` sidecar says it
+        completed and records the same URL, ETag and size the probe reports.
+        Without a successful probe or an ETag nothing on disk can be trusted,
+        so the installer is downloaded afresh. An interrupted download of the same file resumes from where it stopped:
+        a single-stream one from its last byte, a parallel one by fetching
+        only the unfinished part of each range recorded in the sidecar.
+        """
         self.temp_dir.mkdir(parents=True, exist_ok=True)
         installer_path = self.temp_dir / self.installer_name
-        
-        if installer_path.exists():
-            logger.info("Installer already exists, skipping download.")
+        meta_path = installer_path.with_name(installer_path.name + ".meta.json")
+        size, accepts_ranges, etag, url = probe or self._probe_installer(self.url)
+
+        # What the sidecar must match; the installer name carries no version,
+        # so the URL is what tells one build's leftovers from another's.
+        remote = {"url": self.url, "etag": etag, "size": size}
+        meta = self._read_meta(meta_path) if installer_path.exists() else {}
+        have = installer_path.stat().st_size if meta else 0
+        same_remote = bool(size and etag) and all(meta.get(k) == v for k, v in remote.items())
+        if meta.get("complete") and same_remote and have == size:
+            logger.info("Installer already downloaded, skipping download.")
+            self._verify_sha256(installer_path)
             return installer_path
 
-        logger.info(f"Downloading {self.url}...")
+        resume_at = 0
+        ranges = None
+        can_resume = not meta.get("complete") and same_remote and accepts_ranges
+        if can_resume and meta.get("ranges") and have == size:
+            ranges = [(start, end) for start, end in meta["ranges"]]
+            logger.info("Resuming parallel download of %s (%s ranges left)...", self.url, len(ranges))
+        elif can_resume and 0 < have < size:
+            resume_at = have
+            logger.info("Resuming download of %s at byte %s...", self.url, have)
+        else:
+            logger.info("Downloading %s...", self.url)
+
+        digest = None
+        resumable = False
+        progress = None
         try:
-            with requests.get(self.url, stream=True) as r:
-                r.raise_for_status()
-                with open(installer_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-        except requests.RequestException as e:
-            logger.error(f"Download failed: {e}")
+            if ranges or (not resume_at and accepts_ranges and size >= RANGED_DOWNLOAD_MIN_SIZE):
+                if not ranges:
+                    ranges = self._split_ranges(size)
+                    # Preallocate so every worker can write its slice in place.
+                    with open(installer_path, 'wb') as f:
+                        f.truncate(size)
+                # Workers advance each range's start in progress as bytes land,
+                # so a failed run can record which slices are still missing.
+                progress = {start: start for start, _ in ranges}
+                resumable = bool(etag)
+                if resumable:
+                    self._write_meta(meta_path, {**remote, "complete": False, "ranges": ranges})
+                else:
+                    meta_path.unlink(missing_ok=True)
+                try:
+                    self._download_ranges(installer_path, url, etag, ranges, progress)
+                except RangeNotSupportedError as e:
+                    logger.warning("%s, retrying as a single-stream download.", e)
+                    resumable = False
+                    digest = self._download_stream(installer_path, url, etag)
+            else:
+                resumable = bool(etag and accepts_ranges)
+                if resumable:
+                    self._write_meta(meta_path, {**remote, "complete": False})
+                try:
+                    digest = self._download_stream(installer_path, url, etag, resume_at)
+                except RangeNotSupportedError as e:
+                    logger.warning("%s, downloading from the start.", e)
+                    digest = self._download_stream(installer_path, url, etag)
+        except DOWNLOAD_ERRORS as e:
+            logger.error("Download failed: %s", e)
+            # Keep a resumable partial download for the next run; anything
+            # else must not be mistaken for a finished installer.
+            if resumable and progress is not None:
+                remaining = [(progress[start], end) for start, end in ranges if progress[start] <= end]
+                self._write_meta(meta_path, {**remote, "complete": False, "ranges": remaining})
+            if not resumable:
+                installer_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
             raise
-            
+
+        self._verify_sha256(installer_path, digest)
+        self._write_meta(meta_path, {**remote, "size": installer_path.stat().st_size, "complete": True})
         return installer_path
 
-    def extract(self, installer_path: Path) -> Path:
-        extract_dir = self.temp_dir / "extracted"
-        if extract_dir.exists():
-            shutil.rmtree(extract_dir)
-        extract_dir.mkdir(parents=True)
+    def _read_meta(self, meta_path: Path) -> dict:
+        try:
+            return json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta_path: Path, meta: dict):
+        self._atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def _verify_sha256(self, installer_path: Path, digest: Optional[str] = None):
+        """Check the installer against ``--sha256``, hashing the file if no digest is given."""
+        if not self.expected_sha256:
+            return
+
+        if digest is None:
+            h = hashlib.sha256()
+            with open(installer_path, 'rb') as f:
+                for block in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+                    h.update(block)
+            digest = h.hexdigest()
 
-        logger.info(f"Extracting {installer_path} to {extract_dir}...")
-        seven_z = self._get_seven_z()
-        
         try:
-            subprocess.run([seven_z, "x", str(installer_path), f"-o{extract_dir}", "-y"], check=True, stdout=subprocess.DEVNULL)
+            self._check_sha256(digest, str(installer_path))
+        except ValueError:
+            installer_path.unlink(missing_ok=True)
+            raise
+
+    def _check_sha256(self, digest: str, source: str):
+        if digest != self.expected_sha256:
+            raise ValueError(f"SHA-256 mismatch for {source}: expected {self.expected_sha256}, got {digest}")
+        logger.info("Installer SHA-256 verified.")
+
+    def _probe_installer(self, url: str) -> InstallerProbe:
+        """Return the installer size, whether the server accepts byte ranges, its ETag and final URL.
+
+        Downloads use the final URL, so a redirecting link (a bouncer or a
+        "latest" alias) cannot hand different requests different files.
+        """
+        try:
+            r = self.session.head(url, allow_redirects=True, timeout=30)
+            r.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning("Size probe failed, falling back to single-stream download: %s", e)
+            return 0, False, None, url
+
+        size = int(r.headers.get("Content-Length", 0))
+        accepts_ranges = r.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return size, accepts_ranges and size > 0, r.headers.get("ETag"), r.url
+
+    def _range_headers(self, first: int, last: Optional[int], etag: Optional[str]) -> Dict[str, str]:
+        """Headers for a byte-range GET, conditional on the file still matching ``etag``.
+
+        With If-Range a replaced file comes back as a plain 200, which the
+        callers already treat as "start over". Weak ETags are not allowed in
+        If-Range, so those requests go out unconditional.
+        """
+        headers = {"Range": f"bytes={first}-{'' if last is None else last}"}
+        if etag and not etag.startswith("W/"):
+            headers["If-Range"] = etag
+        return headers
+
+    def _download_stream(self, installer_path: Path, url: str, etag: Optional[str] = None,
+                         offset: int = 0) -> Optional[str]:
+        """Download over one connection, appending from ``offset`` when resuming.
+
+        Returns the SHA-256 hashed along the way, or None after a resume since
+        the bytes already on disk were not part of it. Raises
+        RangeNotSupportedError if the server resumes from the wrong byte.
+        """
+        headers = self._range_headers(offset, None, etag) if offset else {}
+        h = hashlib.sha256()
+        with self.session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as r:
+            r.raise_for_status()
+            if offset and r.status_code != 206:
+                logger.warning("Server ignored the resume request, downloading from the start.")
+                offset = 0
+            elif offset and not r.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                raise RangeNotSupportedError(f"Unexpected Content-Range: {r.headers.get('Content-Range')}")
+            r.raw.decode_content = False
+            total = int(r.headers.get("Content-Length", 0))
+            with open(installer_path, 'ab' if offset else 'wb') as f:
+                if total and not offset:
+                    # Reserve the whole file up front so the filesystem can
+                    # allocate it in one go instead of growing it per write.
+                    f.truncate(total)
+                try:
+                    shutil.copyfileobj(r.raw, _HashingWriter(f, h), length=COPY_CHUNK_SIZE)
+                finally:
+                    # Drop any reserved tail the body did not fill, so an
+                    # interrupted download keeps its real length for resuming.
+                    f.truncate()
+        return None if offset else h.hexdigest()
+
+    def _split_ranges(self, size: int, num_conns: int = DOWNLOAD_CONNECTIONS) -> List[Tuple[int, int]]:
+        """Split ``size`` bytes into up to ``num_conns`` inclusive byte ranges."""
+        part_size = -(-size // num_conns)
+        return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+    def _download_ranges(self, installer_path: Path, url: str, etag: Optional[str],
+                         ranges: List[Tuple[int, int]], progress: Dict[int, int]):
+        """Fetch byte ranges of the installer over several connections, one range each.
+
+        The file must already have its full size. ``progress`` maps each
+        range's start to the next byte still to be written.
+        """
+        remaining = sum(end - start + 1 for start, end in ranges)
+        logger.info("Downloading %s bytes over %s connections...", remaining, len(ranges))
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [pool.submit(self._fetch_range, installer_path, url, etag, start, end, progress)
+                       for start, end in ranges]
+            for future in futures:
+                future.result()
+
+    def _fetch_range(self, installer_path: Path, url: str, etag: Optional[str],
+                     start: int, end: int, progress: Dict[int, int]):
+        pos = start
+        for attempt in range(RANGE_RETRIES + 1):
+            try:
+                with self.session.get(url, headers=self._range_headers(pos, end, etag), stream=True,
+                                      timeout=DOWNLOAD_TIMEOUT) as r:
+                    r.raise_for_status()
+                    # Some mirrors advertise ranges but still answer 200 with the whole
+                    # file, or return a different range than the one asked for. A 200
+                    # also means the file changed since the probe (If-Range).
+                    if r.status_code != 206:
+                        raise RangeNotSupportedError(f"Server ignored range request (HTTP {r.status_code})")
+                    if not r.headers.get("Content-Range", "").startswith(f"bytes {pos}-{end}/"):
+                        raise RangeNotSupportedError(f"Unexpected Content-Range: {r.headers.get('Content-Range')}")
+                    # A separate handle per worker keeps seek/write pairs independent;
+                    # os.pwrite would do the same but is unavailable on Windows.
+                    r.raw.decode_content = False
+                    with open(installer_path, 'r+b') as f:
+                        f.seek(pos)
+                        try:
+                            shutil.copyfileobj(r.raw, f, length=COPY_CHUNK_SIZE)
+                        finally:
+                            progress[start] = pos = f.tell()
+                return
+            except RANGE_RETRY_ERRORS as e:
+                if attempt == RANGE_RETRIES:
+                    raise
+                delay = min(0.5 * 2 ** attempt, 10)
+                logger.warning("Range %s-%s failed at byte %s (%s), retrying in %.1fs...", start, end, pos, e, delay)
+                time.sleep(delay)
+
+    def download_and_extract(self, probe: Optional[InstallerProbe] = None) -> Path:
+        """Fetch and unpack the installer, returning the browser's core directory.
+
+        The installer is downloaded to disk while the old extraction and
+        output directories are cleared in parallel.
+        """
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            download = pool.submit(self.download, probe)
+            self.prepare_extract()
+            installer = download.result()
+        return self.extract(installer)
+
+    def prepare_extract(self):
+        """Clear stale extraction state so extract() can start right away.
+
+        Runs while the installer is still downloading.
+        """
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self._discard_tree(self.extract_dir)
+        self.extract_dir.mkdir()
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._discard_tree(self.output_dir / self.config["folder_name"])
+
+        _ = self.seven_z  # resolve now rather than on the extraction path
+
+    def _discard_tree(self, path: Path):
+        """Get a directory out of the way now and delete it in the background.
+
+        The tree is renamed into temp_dir, where it cannot end up in the
+        archive, and removed by the _gc worker; cleanup() waits for it.
+        """
+        if not path.exists():
+            return
+        garbage = self.temp_dir / f"gc.{uuid.uuid4().hex}"
+        try:
+            os.replace(path, garbage)
+        except OSError:
+            shutil.rmtree(path)
+            return
+        self._gc.submit(shutil.rmtree, garbage, ignore_errors=True)
+
+    def extract(self, installer_path: Path) -> Path:
+        extract_dir = self.extract_dir
+        logger.info("Extracting %s to %s...", installer_path, extract_dir)
+        try:
+            subprocess.run(
+                [self.seven_z, "x", str(installer_path), f"-o{extract_dir}", "-y",
+                 f"-mmt={SEVEN_Z_THREADS}", "-bso0", "-bsp0"],
+                check=True, stdout=subprocess.DEVNULL,
+            )
         except subprocess.CalledProcessError:
             logger.error("Extraction failed. Ensure 7-Zip is installed and available.")
             raise
 
-        # Clean up unnecessary files
-        self._remove_file(extract_dir, "setup.exe")
+        return self._install_core()
 
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Locate core directory
-        source_core = self._find_core_dir(extract_dir)
-        
-        # Target directory setup
-        target_name = self.config["folder_name"]
-        target_core = self.output_dir / target_name
+    def _install_core(self) -> Path:
+        """Move the browser's core directory from the extraction dir into output_dir."""
+        extract_dir = self.extract_dir
+
+        # Remove setup.exe and locate the core directory in one pass
+        source_core = self._scan_extracted(extract_dir)
         
-        if target_core.exists():
-            shutil.rmtree(target_core)
+        # Target directory was cleared by prepare_extract()
+        target_core = self.output_dir / self.config["folder_name"]
             
-        logger.info(f"Moving core files from {source_core} to {target_core}")
-        shutil.move(str(source_core), str(target_core))
+        logger.info("Moving core files from %s to %s", source_core, target_core)
+        self._move(source_core, target_core)
         
         return target_core
 
-    def _remove_file(self, root_dir: Path, filename: str):
-        for root, _, files in os.walk(root_dir):
-            if filename in files:
-                try:
-                    os.remove(os.path.join(root, filename))
-                except OSError:
-                    pass
-
-    def _find_core_dir(self, extract_dir: Path) -> Path:
-        if (extract_dir / "core").exists():
-            return extract_dir / "core"
-        
-        for root, _, files in os.walk(extract_dir):
-            if self.config["exe_name"].lower() in [f.lower() for f in files]:
-                return Path(root)
-        
-        return extract_dir
+    def _move(self, src: Path, dst: Path):
+        # Both ends live under the workspace, so a rename normally succeeds;
+        # shutil.move's copy-and-delete is only needed across devices.
+        try:
+            os.replace(src, dst)
+        except OSError:
+            shutil.move(str(src), str(dst))
+
+    def _scan_extracted(self, extract_dir: Path) -> Path:
+        """Delete setup.exe and return the directory holding the browser executable.
+
+        Walks the tree breadth-first with os.scandir. setup.exe only appears in
+        the top two levels, so the walk stops once those are done and the core
+        directory is known.
+        """
+        exe_lower = self.config["exe_name"].lower()
+        core = extract_dir / "core"
+        core_dir = core if core.is_dir() else None
+
+        pending = deque([(extract_dir, 0)])
+        while pending:
+            directory, depth = pending.popleft()
+            if core_dir is not None and depth > 1:
+                break
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append((entry.path, depth + 1))
+                            continue
+                        name = entry.name.lower()
+                        if name == "setup.exe" and depth <= 1:
+                            try: os.unlink(entry.path)
+                            except OSError: pass
+                        elif name == exe_lower and core_dir is None:
+                            core_dir = Path(directory)
+            except OSError:
+                continue
+
+        return core_dir if core_dir is not None else extract_dir
 
     def inject(self, core_dir: Path):
         logger.info("Injecting portable files...")
         
-        # 1. Copy libportable files
-        for item in self.libportable_path.glob("*"):
-            if item.is_file():
-                shutil.copy2(item, core_dir)
+        # 1. Copy libportable files, overlapping the per-file I/O on a few threads
+        with os.scandir(self.libportable_path) as it:
+            sources = [entry.path for entry in it if entry.is_file()]
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS) as pool:
+            # copy2 rather than copyfile + copystat: on Windows with Python 3.12+
+            # it hands the whole copy, metadata included, to the kernel's CopyFile2.
+            list(pool.map(shutil.copy2, sources, itertools.repeat(core_dir)))
         
         # 2. Prepare upcheck.exe
         self._prepare_upcheck(core_dir)
 
-        # 3. Run injection
+        # 3. Start injection
         upcheck = core_dir / "upcheck.exe"
+        proc = None
         if upcheck.exists():
             try:
-                logger.info(f"Running injection: {upcheck} -dll")
-                result = subprocess.run([str(upcheck), "-dll"], cwd=core_dir, capture_output=True, text=True)
-                if result.returncode != 0:
-                    logger.warning(f"Injection warning: {result.stderr}")
-                else:
-                    logger.info("Injection successful.")
+                logger.info("Running injection: %s -dll", upcheck)
+                proc = subprocess.Popen(
+                    [str(upcheck), "-dll"], cwd=core_dir,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                )
             except Exception as e:
-                logger.error(f"Injection failed: {e}")
+                logger.error("Injection failed: %s", e)
                 raise
         else:
             logger.warning("upcheck.exe not found, skipping injection execution.")
 
-        # 4. Cleanup injection tools
+        # 4. Handle portable.ini while upcheck is still running
+        try:
+            self._setup_portable_ini(core_dir)
+        finally:
+            if proc is not None:
+                _, stderr = proc.communicate()
+        if proc is not None:
+            if proc.returncode != 0:
+                logger.warning("Injection warning: %s", stderr.decode('utf-8', 'replace'))
+            else:
+                logger.info("Injection successful.")
+
+        # 5. Cleanup injection tools
         self._cleanup_injection_tools(core_dir)
 
-        # 5. Handle portable.ini
-        self._setup_portable_ini(core_dir)
-
     def _prepare_upcheck(self, core_dir: Path):
         upcheck = core_dir / "upcheck.exe"
         if not upcheck.exists():
@@ -193,34 +613,45 @@ class BrowserBuilder:
             for candidate in ["upcheck64.exe", "upcheck32.exe"]:
                 src = core_dir / candidate
                 if src.exists():
-                    shutil.move(str(src), str(upcheck))
+                    self._move(src, upcheck)
                     break
 
     def _cleanup_injection_tools(self, core_dir: Path):
-        # Remove upcheck exes and setdll tools
-        for pattern in ["upcheck*.exe", "setdll*.exe"]:
-            for f in core_dir.glob(pattern):
-                try: f.unlink()
-                except: pass
-        
+        # Remove upcheck exes and setdll tools in a single directory pass.
         # Also remove portable32.dll if we are assuming 64bit, or let the user decide?
         # The original script deleted portable32.dll unconditionally in some paths or if bits=64.
         # Here we assume we are building 64-bit mostly.
-        p32 = core_dir / "portable32.dll"
-        if p32.exists():
-            try: p32.unlink()
-            except: pass
+        with os.scandir(core_dir) as it:
+            for entry in it:
+                name = entry.name.lower()
+                is_tool = name.startswith(("upcheck", "setdll")) and name.endswith(".exe")
+                if is_tool or name == "portable32.dll":
+                    try: os.unlink(entry.path)
+                    except OSError: pass
 
     def _setup_portable_ini(self, core_dir: Path):
         ini_example = core_dir / "portable(example).ini"
         ini_target = core_dir / "portable.ini"
         if ini_example.exists() and not ini_target.exists():
-            shutil.copy2(ini_example, ini_target)
+            self._atomic_write(ini_target, ini_example.read_bytes())
+            shutil.copystat(ini_example, ini_target)
+
+    def _atomic_write(self, path: Path, data: bytes):
+        """Write data to path via a sibling temp file so a crash never leaves a partial file."""
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False) as tmp:
+            tmp.write(data)
+        try:
+            # NamedTemporaryFile creates 0600 files; match a normal open() instead.
+            os.chmod(tmp.name, 0o644)
+            os.replace(tmp.name, path)
+        except OSError:
+            os.unlink(tmp.name)
+            raise
 
     def generate_launcher(self, custom_launcher_path: Optional[str] = None):
         """Generate or copy launcher script."""
         if custom_launcher_path and Path(custom_launcher_path).exists():
-            logger.info(f"Using provided launcher: {custom_launcher_path}")
+            logger.info("Using provided launcher: %s", custom_launcher_path)
             shutil.copy2(custom_launcher_path, self.output_dir)
             return
 
@@ -248,26 +679,23 @@ if %errorlevel% neq 0 (
 echo [Success] Shortcut created: %lnk%
 """
         launcher_path = self.output_dir / launcher_name
-        with open(launcher_path, "w", encoding="utf-8") as f:
-            f.write(launcher_content)
-        logger.info(f"Generated launcher: {launcher_path}")
+        self._atomic_write(launcher_path, launcher_content.encode("utf-8"))
+        logger.info("Generated launcher: %s", launcher_path)
 
     def create_archive(self):
         logger.info("Creating archive...")
-        archive_name = f"{self.browser_name.capitalize()}_{self.version}.7z"
+        archive_name = f"{self.browser_name.capitalize()}_{self.version}{ARCHIVE_SUFFIXES[self.archive_format]}"
         output_archive = self.workspace / archive_name
         
         if output_archive.exists():
             output_archive.unlink()
 
-        seven_z = self._get_seven_z()
-        try:
-            subprocess.run([seven_z, "a", str(output_archive), "*", "-mx9"], cwd=self.output_dir, check=True, stdout=subprocess.DEVNULL)
-        except subprocess.CalledProcessError:
-             logger.error("Archiving failed.")
-             raise
+        if self.archive_format == "zstd" and zstandard is not None:
+            self._write_tar_zst(output_archive)
+        else:
+            self._run_archiver(output_archive)
         
-        logger.info(f"Archive created: {output_archive}")
+        logger.info("Archive created: %s", output_archive)
         
         if "GITHUB_OUTPUT" in os.environ:
             with open(os.environ["GITHUB_OUTPUT"], "a") as f:
@@ -275,20 +703,72 @@ echo [Success] Shortcut created: %lnk%
                 f.write(f"artifact_name={archive_name}\n")
                 f.write(f"version={self.version}\n")
 
+    def _write_tar_zst(self, output_archive: Path):
+        """Tar output_dir through the zstandard binding on all cores, no external tools needed."""
+        cctx = zstandard.ZstdCompressor(level=19, threads=-1)
+        try:
+            with open(output_archive, "wb") as fh, cctx.stream_writer(fh) as writer, \
+                    tarfile.open(fileobj=writer, mode="w|") as tar:
+                tar.add(str(self.output_dir), arcname=".")
+        except (OSError, tarfile.TarError, zstandard.ZstdError):
+            logger.error("Archiving failed.")
+            raise
+
+    def _run_archiver(self, output_archive: Path):
+        if self.archive_format == "7z":
+            # Hand 7z the top-level entries as a UTF-8 list file (it recurses
+            # into directories itself) rather than a wildcard it must match.
+            list_file = self.temp_dir / "archive.lst"
+            with os.scandir(self.output_dir) as it:
+                names = sorted(entry.name for entry in it)
+            self.temp_dir.mkdir(parents=True, exist_ok=True)
+            list_file.write_text("\n".join(names) + "\n", encoding="utf-8")
+            # LZMA2 at -mx7 with a 64 MB dictionary compresses nearly as well
+            # as -mx9 while splitting the work across SEVEN_Z_THREADS.
+            cmd = [self.seven_z, "a", str(output_archive), f"@{list_file}", "-scsUTF-8",
+                   "-m0=lzma2", "-mx7", "-md=64m", f"-mmt={SEVEN_Z_THREADS}"]
+        else:
+            cmd = ["tar", f"--use-compress-program={TAR_COMPRESSORS[self.archive_format]}",
+                   "-cf", str(output_archive), "-C", str(self.output_dir), "."]
+        try:
+            subprocess.run(cmd, cwd=self.output_dir, check=True, stdout=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+             logger.error("Archiving failed.")
+             raise
+
     def cleanup(self):
+        self._gc.shutdown(wait=True)
         if self.temp_dir.exists():
-            logger.info(f"Cleaning up temporary directory: {self.temp_dir}")
+            logger.info("Cleaning up temporary directory: %s", self.temp_dir)
             try:
                 shutil.rmtree(self.temp_dir)
             except Exception as e:
-                logger.warning(f"Failed to cleanup temp dir: {e}")
+                logger.warning("Failed to cleanup temp dir: %s", e)
 
     def run(self):
         self.fetch_latest_version()
-        installer = self.download()
-        core_dir = self.extract(installer)
-        self.inject(core_dir)
-        self.generate_launcher(self.launcher_arg)
+
+        # The release check and the installer's HEAD probe are independent
+        # round-trips, so issue them concurrently.
+        probe = None
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            if self.release_repo:
+                probe = pool.submit(self._probe_installer, self.url)
+            released = self.check_remote_release()
+        if released:
+            logger.info("Version %s is already released in %s, skipping build.", self.version, self.release_repo)
+            if "GITHUB_OUTPUT" in os.environ:
+                with open(os.environ["GITHUB_OUTPUT"], "a") as f:
+                    f.write("skipped=true\n")
+            return
+
+        core_dir = self.download_and_extract(probe.result() if probe else None)
+        # The launcher only writes into output_dir, so it can be produced
+        # while libportable is injected into the core directory.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            launcher = pool.submit(self.generate_launcher, self.launcher_arg)
+            self.inject(core_dir)
+            launcher.result()
         self.create_archive()
         self.cleanup()
 
@@ -313,6 +793,9 @@ Typical GitHub Actions usage:
     parser.add_argument("--launcher", help="Path to custom launcher script (optional)")
     parser.add_argument("--workspace", help="Workspace directory")
     parser.add_argument("--seven-z-path", help="Path to 7z executable")
+    parser.add_argument("--sha256", help="Expected SHA-256 of the installer (optional)")
+    parser.add_argument("--archive-format", choices=sorted(ARCHIVE_SUFFIXES), default="7z", help="Release archive format (default: 7z)")
+    parser.add_argument("--release-repo", help="GitHub repository (owner/name); skip the build if it already has a release for --version")
     
     args = parser.parse_args()
     
@@ -320,5 +803,5 @@ Typical GitHub Actions usage:
         builder = BrowserBuilder(args)
         builder.run()
     except Exception as e:
-        logger.error(f"Build failed: {e}")
+        logger.error("Build failed: %s", e)
         sys.exit(1)